@@ -1,10 +1,24 @@
+from bisect import bisect_right
+from functools import lru_cache
+
+# Lower bound of each life stage; ages below 0 have no stage
+AGE_BOUNDS = (0, 13, 20)
+LIFE_STAGES = (None, "Child", "Teenager", "Adult")
+
+
+# Real ages take only a few hundred distinct values, so the cache stays warm
+@lru_cache(maxsize=256)
 def generate_profile(age):
-    if 0 <= age <= 12:
-        return "Child"
-    elif 13 <= age <= 19:
-        return "Teenager"
-    elif age >= 20:
-        return "Adult"
+    # Position of age among the bounds picks the stage, no if/elif chain
+    return LIFE_STAGES[bisect_right(AGE_BOUNDS, age)]
+
+
+def generate_profiles(ages):
+    # Batch version for many users at once: one vectorized numpy call
+    import numpy as np
+
+    stages = np.array(LIFE_STAGES, dtype=object)
+    return stages[np.searchsorted(AGE_BOUNDS, ages, side="right")]
 
 
 def main():
@@ -13,12 +27,10 @@ def main():
     birth_year = int(birth_year_str)
     current_age = 2025 - birth_year
 
-    hobbies = []
-    while True:
-        hobby = input("Enter a favorite hobby or type 'stop' to finish: ")
-        if hobby == "stop":
-            break
-        hobbies.append(hobby)
+    # iter() keeps calling input() until it returns the "stop" sentinel
+    hobbies = list(
+        iter(lambda: input("Enter a favorite hobby or type 'stop' to finish: "), "stop")
+    )
 
     life_stage = generate_profile(current_age)
 
@@ -42,4 +54,5 @@ def main():
         print("You didn't mention any hobbies.")
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
-# Основной список для хранения данных студентов
-students = []
+from operator import itemgetter
+
+# Команда завершения ввода оценок
+_DONE = "done"
+
+# Основной словарь для хранения данных студентов: имя -> запись студента
+# В записи храним только сумму, количество оценок и готовый средний балл,
+# который пересчитывается при добавлении оценки (сами оценки не нужны)
+students: dict[str, dict] = {}
 
 # Главный цикл программы с меню
 while True:
@@ -14,36 +21,39 @@ while True:
     # Добавление нового студента
     if choice == "1":
         new_name = input("Enter student name:")
-        exists = any(s["name"] == new_name for s in students)
-        if exists:
+        if new_name in students:
             print("This student is alredy exists")
         else:
-            new_dict = {"name": new_name, "grades": []}
-            students.append(new_dict)
+            students[new_name] = {
+                "name": new_name,
+                "sum": 0.0,
+                "count": 0,
+                "average": 0.0,
+            }
 
     # Добавление оценок для существующего студента
     elif choice == "2":
         name = input("Enter student name: ")
-        exists_student = any(s["name"] == name for s in students)
-
-        if exists_student:
-            # Ищем конкретного студента чтобы добавить ему оценки
-            for student in students:
-                if student["name"] == name:
-                    # Цикл для ввода нескольких оценок
-                    while True:
-                        grade_input = input("Enter a grade (or 'done' to finish): ")
-                        if grade_input.lower() == "done":
-                            break
-                        try:
-                            grade = float(grade_input)
-                            if 0 <= grade <= 100:
-                                student["grades"].append(grade)
-                            else:
-                                print("Grade must be between 0 and 100")
-                        except ValueError:
-                            print("Invalid input. Please enter a number.")
+        # Ищем конкретного студента чтобы добавить ему оценки
+        student = students.get(name)
+
+        if student is not None:
+            # Цикл для ввода нескольких оценок
+            while True:
+                grade_input = input("Enter a grade (or 'done' to finish): ")
+                # Сначала сравниваем длину, чтобы не создавать строку lower() для оценок
+                if len(grade_input) == len(_DONE) and grade_input.lower() == _DONE:
                     break
+                try:
+                    grade = float(grade_input)
+                    if 0 <= grade <= 100:
+                        student["sum"] += grade
+                        student["count"] += 1
+                        student["average"] = student["sum"] / student["count"]
+                    else:
+                        print("Grade must be between 0 and 100")
+                except ValueError:
+                    print("Invalid input. Please enter a number.")
         else:
             print("There is no such student")
 
@@ -57,22 +67,18 @@ while True:
 
         # Список для хранения средних баллов студентов с оценками
         averages = []
-        for student in students:
-            name = student.get("name", "")
-            grades = student.get("grades", [])
+        for student in students.values():
+            name = student["name"]
 
             # Студенты без оценок
-            if not grades:
+            if not student["count"]:
                 print(f"{name}'s average grade is N/A")
                 continue
 
-            # Расчет среднего балла
-            try:
-                average = sum(grades) / len(grades)
-                print(f"{name}'s average grade is {average:.1f}")
-                averages.append(average)
-            except ZeroDivisionError:
-                print(f"{name}'s average grade is N/A")
+            # Средний балл уже посчитан при добавлении оценок
+            average = student["average"]
+            print(f"{name}'s average grade is {average:.1f}")
+            averages.append(average)
 
         # Вывод общей статистики если есть студенты с оценками
         if averages:
@@ -87,18 +93,16 @@ while True:
             continue
 
         # Фильтруем только студентов у которых есть оценки
-        students_with_grades = [s for s in students if s["grades"]]
+        students_with_grades = [s for s in students.values() if s["count"]]
 
         if not students_with_grades:
             print("No students with grades")
             continue
 
-        # Используем max с lambda функцией для поиска лучшего студента
+        # Используем max по готовому среднему баллу для поиска лучшего студента
         try:
-            top_student = max(
-                students_with_grades, key=lambda s: sum(s["grades"]) / len(s["grades"])
-            )
-            top_average = sum(top_student["grades"]) / len(top_student["grades"])
+            top_student = max(students_with_grades, key=itemgetter("average"))
+            top_average = top_student["average"]
             print(
                 f"The student with the highest average is {top_student['name']} with a grade of {top_average:.1f}"
             )
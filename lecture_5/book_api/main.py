@@ -1,25 +1,136 @@
 # main.py
 # Main FastAPI application file
 
+import asyncio
+import itertools
+import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException, Depends, Query
-from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, Column, Integer, String, or_
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+import orjson
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from pydantic.dataclasses import dataclass
+from sqlalchemy import (
+    bindparam,
+    delete,
+    event,
+    func,
+    insert,
+    select,
+    update,
+    Column,
+    Index,
+    Integer,
+    String,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_scoped_session,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateIndex
 
 # --- DATABASE SETUP ---
 # Create connection to SQLite database (file will be created automatically)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./books.db"
+# aiosqlite driver lets endpoints await queries instead of blocking a thread
+SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./books.db"
 
-# Create SQLAlchemy engine for database operations
-engine = create_engine(
+# Same file opened read-only through an SQLite URI, used by GET endpoints
+SQLALCHEMY_READ_DATABASE_URL = "sqlite+aiosqlite:///file:books.db?mode=ro&uri=true"
+
+# Connection tuning shared by both engines
+COMMON_PRAGMAS = (
+    "PRAGMA busy_timeout=5000",  # Wait up to 5s for a lock
+    "PRAGMA cache_size=-20000",  # ~20 MB page cache
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Writer engine: one connection opened once and shared for the whole process,
+# so its page cache and prepared statements stay warm between requests
+write_engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},  # Required for SQLite
+    poolclass=StaticPool,
+    query_cache_size=1200,  # Keep compiled SQL for every query shape we use
+)
+
+# Reader engine: one connection per CPU, WAL lets them read while a write runs
+read_engine = create_async_engine(
+    SQLALCHEMY_READ_DATABASE_URL,
+    connect_args={"check_same_thread": False},  # Required for SQLite
+    pool_size=os.cpu_count() or 1,
+    query_cache_size=1200,  # Keep compiled SQL for every query shape we use
+)
+
+
+# PRAGMAs are set on the underlying sync engine, which owns the DBAPI connections
+@event.listens_for(write_engine.sync_engine, "connect")
+def set_writer_pragmas(dbapi_conn, _):
+    """
+    Tunes the writer connection for concurrent API traffic.
+    WAL lets readers run alongside the writer, synchronous=NORMAL
+    avoids an fsync on every commit, and the larger page cache and
+    in-memory temp store keep hot data out of the disk.
+    """
+    # Let SQLAlchemy emit BEGIN itself (see begin_immediate below)
+    dbapi_conn.isolation_level = None
+
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    for pragma in COMMON_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+@event.listens_for(write_engine.sync_engine, "begin")
+def begin_immediate(conn):
+    """
+    Starts write transactions with BEGIN IMMEDIATE.
+    The write lock is taken up front, so a transaction never fails
+    halfway through when it tries to upgrade from a read lock.
+    """
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+@event.listens_for(read_engine.sync_engine, "connect")
+def set_reader_pragmas(dbapi_conn, _):
+    """
+    Tunes reader connections and forbids them from changing data.
+    """
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA query_only=1")
+    for pragma in COMMON_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+# Create session factories for database interactions
+# expire_on_commit=False keeps loaded attributes usable after commit without lazy loads
+WriteSessionLocal = async_sessionmaker(
+    bind=write_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Id of the request being handled, set by db_session_middleware
+current_request_id: ContextVar[Optional[int]] = ContextVar(
+    "current_request_id", default=None
 )
+request_ids = itertools.count()
 
-# Create session factory for database interactions
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Request-scoped sessions: calling ReadSession() / WriteSession() anywhere
+# inside one request returns the same session, created on first use
+ReadSession = async_scoped_session(ReadSessionLocal, scopefunc=current_request_id.get)
+WriteSession = async_scoped_session(WriteSessionLocal, scopefunc=current_request_id.get)
 
 # Base class for SQLAlchemy models
 Base = declarative_base()
@@ -40,14 +151,53 @@ class BookDB(Base):
     author = Column(String, nullable=False)  # Required field
     year = Column(Integer, nullable=True)  # Optional field
 
+    # Indexes for search: lower() expressions serve case-insensitive prefix searches
+    __table_args__ = (
+        Index("ix_books_title_lower", func.lower(title)),
+        Index("ix_books_author_lower", func.lower(author)),
+    )
 
-# Create all tables in the database
-# This will execute on first application run
-Base.metadata.create_all(bind=engine)
+
+class BooksVersionDB(Base):
+    """
+    Version of the whole books table, a single row with id 1.
+    Bumped in the same transaction as every write, used to tag book lists.
+    """
+
+    __tablename__ = "books_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class BookVersionDB(Base):
+    """
+    Version of a single book, used to tag GET /books/{id} responses.
+    Bumped only when that book is written; the row is kept after the book
+    is deleted, so a new book reusing the id never gets an old tag.
+    """
+
+    __tablename__ = "book_versions"
+
+    book_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# --- PREBUILT QUERIES ---
+# Built once at import, so each request only binds the id instead of
+# constructing the statement and its cache key again
+GET_BOOK_BY_ID = select(BookDB).where(BookDB.id == bindparam("id"))
+
+# Plain column select for list endpoints: rows come back as tuples,
+# without creating ORM objects and tracking them in the session
+SELECT_BOOK_ROWS = select(BookDB.id, BookDB.title, BookDB.author, BookDB.year)
 
 
 # --- PYDANTIC MODELS (for API data validation) ---
-class BookCreate(BaseModel):
+# Slotted pydantic dataclass: validated by pydantic-core like a BaseModel,
+# but each instance is a small object without __dict__ or model bookkeeping
+@dataclass(slots=True)
+class BookCreate:
     """
     Model for creating a new book.
     Used for validating input data in POST and PUT requests.
@@ -58,6 +208,10 @@ class BookCreate(BaseModel):
     year: Optional[int] = Field(None, ge=0, le=2100, description="Publication year")
 
 
+# Serializer compiled once, turns a validated bulk request into insert rows
+BOOK_CREATE_LIST_ADAPTER = TypeAdapter(List[BookCreate])
+
+
 class BookResponse(BaseModel):
     """
     Model for API response when retrieving a book.
@@ -70,22 +224,95 @@ class BookResponse(BaseModel):
     year: Optional[int]
 
     # Configuration for working with SQLAlchemy objects
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
-# --- FASTAPI DEPENDENCIES ---
-def get_db():
+# --- DATABASE SESSIONS ---
+@asynccontextmanager
+async def write_transaction():
     """
-    Dependency for getting database session.
-    This function will be called for each API request.
-    Ensures session is closed after request processing.
+    Opens a transaction on the request's write session.
+    Commits if the block succeeds and rolls back if it raises.
+    Holds the write lock, so only one request uses the shared writer
+    connection at a time, and never past the end of its transaction.
     """
-    db = SessionLocal()
-    try:
+    db = WriteSession()
+    async with app.state.write_lock, db.begin():
         yield db
-    finally:
-        db.close()
+
+
+# --- HTTP CACHING (ETag) ---
+# Versions are stored in the database and bumped inside the write
+# transaction, so every worker process sees the same tags
+books_version_table = BooksVersionDB.__table__
+book_versions_table = BookVersionDB.__table__
+
+GET_BOOKS_VERSION = select(books_version_table.c.version).where(
+    books_version_table.c.id == 1
+)
+GET_BOOK_VERSION = select(book_versions_table.c.version).where(
+    book_versions_table.c.book_id == bindparam("id")
+)
+BUMP_BOOKS_VERSION = (
+    update(books_version_table)
+    .where(books_version_table.c.id == 1)
+    .values(version=books_version_table.c.version + 1)
+)
+BUMP_BOOK_VERSION = sqlite_insert(book_versions_table).on_conflict_do_update(
+    index_elements=["book_id"], set_={"version": book_versions_table.c.version + 1}
+)
+
+
+async def mark_books_changed(db: AsyncSession, *book_ids: int):
+    """
+    Invalidates cached lists and the cached copies of the given books.
+    Must be called inside every write transaction that changes the books
+    table, so the new versions are committed together with the data.
+    """
+    await db.execute(BUMP_BOOKS_VERSION)
+    await db.execute(
+        BUMP_BOOK_VERSION, [{"book_id": book_id, "version": 1} for book_id in book_ids]
+    )
+
+
+def not_modified(request: Request, etag: str):
+    """
+    Returns an empty 304 response if the client already has this version.
+    """
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+# --- APPLICATION LIFESPAN ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates all tables in the database on application startup.
+    This will execute on first application run.
+    Creates the write lock on the event loop that serves the app.
+    Disposes engine connections on shutdown.
+    """
+    # StaticPool hands the same connection to every write session, so they
+    # take turns on it through this lock. It is created here, not at import,
+    # because an asyncio.Lock only works on the event loop it was first used on
+    app.state.write_lock = asyncio.Lock()
+
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # create_all skips existing tables, so add indexes missing from an older file
+        # (IF NOT EXISTS, because SQLite does not reflect lower() expression indexes)
+        for index in BookDB.__table__.indexes:
+            await conn.execute(CreateIndex(index, if_not_exists=True))
+        # Row holding the version of the books table, see BooksVersionDB
+        await conn.execute(
+            sqlite_insert(books_version_table)
+            .values(id=1, version=0)
+            .on_conflict_do_nothing()
+        )
+    yield
+    await read_engine.dispose()
+    await write_engine.dispose()
 
 
 # --- CREATE FASTAPI APPLICATION ---
@@ -93,12 +320,32 @@ app = FastAPI(
     title="Simple Book Collection API",
     description="API for managing book collection",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # orjson encodes JSON in C
 )
 
 
+# --- MIDDLEWARE ---
+@app.middleware("http")
+async def db_session_middleware(request: Request, call_next):
+    """
+    Gives every request its own session scope.
+    Sessions are closed and their connections returned to the pool as
+    soon as the endpoint has produced the response, before the body is
+    sent to the client.
+    """
+    token = current_request_id.set(next(request_ids))
+    try:
+        return await call_next(request)
+    finally:
+        await ReadSession.remove()
+        await WriteSession.remove()
+        current_request_id.reset(token)
+
+
 # --- ROOT ENDPOINT ---
 @app.get("/")
-def read_root():
+async def read_root():
     """
     Root endpoint for API health check.
     """
@@ -110,60 +357,84 @@ def read_root():
 
 # ENDPOINT 1: Create new book
 @app.post("/books/", response_model=BookResponse, status_code=201)
-def create_book(book: BookCreate, db: Session = Depends(get_db)):
+async def create_book(book: BookCreate):
     """
     Creates a new book in the collection.
 
     Args:
         book: Book data (title, author, year)
-        db: Database session (auto-injected)
 
     Returns:
         Created book with assigned id
     """
-    # Create book object for database
-    db_book = BookDB(**book.dict())
-
-    # Add book to database
-    db.add(db_book)
-    db.commit()  # Save changes
-    db.refresh(db_book)  # Refresh object to get id
+    # Insert book and get the stored row (with its id) back in the same statement
+    async with write_transaction() as db:
+        result = await db.execute(
+            insert(BookDB)
+            .values(title=book.title, author=book.author, year=book.year)
+            .returning(BookDB)
+        )
+        db_book = result.scalar_one()
+        await mark_books_changed(db, db_book.id)
 
     return db_book
 
 
 # ENDPOINT 2: Get all books
 @app.get("/books/", response_model=List[BookResponse])
-def read_books(
+async def read_books(
+    request: Request,
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=100, description="Maximum records per page"),
-    db: Session = Depends(get_db),
 ):
     """
     Retrieves list of all books with pagination support.
+    Sends 304 Not Modified after only a version lookup
+    if the client's ETag matches the current version of the list.
 
     Args:
+        request: Incoming request (for the If-None-Match header)
         skip: How many records to skip (for pagination)
         limit: Maximum records per page
-        db: Database session
 
     Returns:
         List of books with pagination
     """
+    db = ReadSession()
+
+    # Tag is taken before the query, so a concurrent write can only make it stale
+    version = (await db.execute(GET_BOOKS_VERSION)).scalar_one()
+    etag = f'W/"{version}-{skip}-{limit}"'
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
     # Get books from database with pagination
-    books = db.query(BookDB).offset(skip).limit(limit).all()
-    return books
+    result = await db.execute(SELECT_BOOK_ROWS.offset(skip).limit(limit))
+
+    # Build the JSON directly: returning a response skips response_model
+    # validation, which is the most expensive part of this endpoint
+    return ORJSONResponse(
+        [dict(row) for row in result.mappings()], headers={"ETag": etag}
+    )
 
 
 # ENDPOINT 3: Get book by ID
 @app.get("/books/{book_id}", response_model=BookResponse)
-def read_book(book_id: int, db: Session = Depends(get_db)):
+async def read_book(
+    book_id: int,
+    request: Request,
+    response: Response,
+):
     """
     Retrieves a book by its ID.
+    Sends 304 Not Modified after only a version lookup
+    if the client's ETag matches the current version of the book.
 
     Args:
         book_id: Book ID
-        db: Database session
+        request: Incoming request (for the If-None-Match header)
+        response: Outgoing response (to set the ETag header)
 
     Raises:
         HTTPException: If book is not found
@@ -171,26 +442,35 @@ def read_book(book_id: int, db: Session = Depends(get_db)):
     Returns:
         Book with specified ID
     """
+    db = ReadSession()
+
+    version = (await db.execute(GET_BOOK_VERSION, {"id": book_id})).scalar() or 0
+    etag = f'W/"{book_id}-{version}"'
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
     # Find book in database
-    book = db.query(BookDB).filter(BookDB.id == book_id).first()
+    result = await db.execute(GET_BOOK_BY_ID, {"id": book_id})
+    book = result.scalar_one_or_none()
 
     # If book not found, return 404 error
     if book is None:
         raise HTTPException(status_code=404, detail="Book not found")
 
+    response.headers["ETag"] = etag
     return book
 
 
 # ENDPOINT 4: Update book
 @app.put("/books/{book_id}", response_model=BookResponse)
-def update_book(book_id: int, book_update: BookCreate, db: Session = Depends(get_db)):
+async def update_book(book_id: int, book_update: BookCreate):
     """
     Updates book information.
 
     Args:
         book_id: ID of book to update
         book_update: New book data
-        db: Database session
 
     Raises:
         HTTPException: If book is not found
@@ -198,58 +478,100 @@ def update_book(book_id: int, book_update: BookCreate, db: Session = Depends(get
     Returns:
         Updated book
     """
-    # Find book in database
-    db_book = db.query(BookDB).filter(BookDB.id == book_id).first()
-
-    if db_book is None:
-        raise HTTPException(status_code=404, detail="Book not found")
-
-    # Update book fields
-    for key, value in book_update.dict().items():
-        setattr(db_book, key, value)
-
-    # Save changes
-    db.commit()
-    db.refresh(db_book)
+    # Update book fields and get the updated row back in one statement
+    # (no separate SELECT to check that the book exists)
+    # Changes are saved when the transaction block ends
+    async with write_transaction() as db:
+        result = await db.execute(
+            update(BookDB)
+            .where(BookDB.id == book_id)
+            .values(
+                title=book_update.title,
+                author=book_update.author,
+                year=book_update.year,
+            )
+            .returning(BookDB)
+        )
+        db_book = result.scalar_one_or_none()
+
+        if db_book is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        await mark_books_changed(db, book_id)
 
     return db_book
 
 
 # ENDPOINT 5: Delete book
 @app.delete("/books/{book_id}", status_code=204)
-def delete_book(book_id: int, db: Session = Depends(get_db)):
+async def delete_book(book_id: int):
     """
     Deletes a book from collection.
 
     Args:
         book_id: ID of book to delete
-        db: Database session
 
     Raises:
         HTTPException: If book is not found
     """
-    # Find book in database
-    book = db.query(BookDB).filter(BookDB.id == book_id).first()
+    # Delete book directly, the number of deleted rows tells if it existed
+    async with write_transaction() as db:
+        result = await db.execute(delete(BookDB).where(BookDB.id == book_id))
 
-    if book is None:
-        raise HTTPException(status_code=404, detail="Book not found")
-
-    # Delete book
-    db.delete(book)
-    db.commit()
+        if result.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Book not found")
+        await mark_books_changed(db, book_id)
 
     # Return empty response with status 204 (No Content)
 
 
+# --- SEARCH HELPERS ---
+def starts_with(column, prefix: str):
+    """
+    Builds a case-insensitive "starts with" condition for a column.
+    Written as a range over lower(column) so SQLite can answer it from
+    the lower() expression index; LIKE on an expression is always a scan.
+    """
+    lowered_column = func.lower(column)
+    lowered_prefix = func.lower(prefix)
+    # Every string starting with prefix sorts below prefix + the highest code point
+    return lowered_column.between(lowered_prefix, lowered_prefix + "\U0010ffff")
+
+
+# Rows fetched from SQLite and sent to the client per step of stream_books
+SEARCH_BATCH_SIZE = 200
+
+
+async def stream_books(stmt):
+    """
+    Yields the rows of a book query as parts of one JSON array.
+    Rows are read through a server-side cursor in batches, so memory use
+    does not grow with the result size and the first rows are sent
+    before the last ones are read.
+    The session is opened here rather than taken from ReadSession,
+    because the body is still being sent after the request's sessions
+    are closed.
+    """
+    async with ReadSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=SEARCH_BATCH_SIZE))
+        yield b"["
+        separator = b""
+        async for rows in result.mappings().partitions():
+            yield separator + b",".join(orjson.dumps(dict(row)) for row in rows)
+            separator = b","
+        yield b"]"
+
+
 # ENDPOINT 6: Search books
 @app.get("/books/search/", response_model=List[BookResponse])
-def search_books(
+async def search_books(
     title: Optional[str] = Query(None, description="Search by title (partial match)"),
     author: Optional[str] = Query(None, description="Search by author (partial match)"),
     year: Optional[int] = Query(
         None, ge=0, le=2100, description="Search by publication year"
     ),
-    db: Session = Depends(get_db),
+    prefix: bool = Query(
+        False, description="Match title and author from the beginning (uses index)"
+    ),
 ):
     """
     Search books by various criteria.
@@ -260,27 +582,70 @@ def search_books(
         title: Part of book title (case-insensitive search)
         author: Part of author name (case-insensitive search)
         year: Publication year
-        db: Database session
+        prefix: Match title/author only at the beginning instead of anywhere
 
     Returns:
-        List of books matching search criteria
+        List of books matching search criteria, streamed as a JSON array
     """
     # Start database query
-    query = db.query(BookDB)
+    stmt = SELECT_BOOK_ROWS
 
     # Add search conditions if parameters provided
+    # Prefix search uses the lower() indexes, partial match scans the whole table
     if title:
-        query = query.filter(BookDB.title.ilike(f"%{title}%"))
+        if prefix:
+            stmt = stmt.where(starts_with(BookDB.title, title))
+        else:
+            stmt = stmt.where(BookDB.title.ilike(f"%{title}%"))
 
     if author:
-        query = query.filter(BookDB.author.ilike(f"%{author}%"))
+        if prefix:
+            stmt = stmt.where(starts_with(BookDB.author, author))
+        else:
+            stmt = stmt.where(BookDB.author.ilike(f"%{author}%"))
 
     if year is not None:
-        query = query.filter(BookDB.year == year)
+        stmt = stmt.where(BookDB.year == year)
+
+    # Execute query and stream results in batches of SEARCH_BATCH_SIZE rows
+    return StreamingResponse(stream_books(stmt), media_type="application/json")
+
 
-    # Execute query and return results
-    books = query.all()
-    return books
+# Largest batch accepted by create_books: a batch holds the write lock
+# for the whole insert, so bigger ones would stall every other write
+BULK_MAX_BOOKS = 1000
+
+
+# ENDPOINT 7: Create several books at once
+@app.post("/books/bulk/", response_model=List[BookResponse], status_code=201)
+async def create_books(
+    books: List[BookCreate] = Body(..., max_length=BULK_MAX_BOOKS),
+):
+    """
+    Creates several books in one transaction.
+    Much faster than calling POST /books/ for each book,
+    because all rows are saved with a single commit.
+
+    Args:
+        books: List of book data (title, author, year), at most BULK_MAX_BOOKS
+
+    Returns:
+        Created books with assigned ids, in the same order as the input
+    """
+    if not books:
+        return []
+
+    # Insert all books with one statement and get the stored rows back
+    # (SQLite returns rows in any order, so ask SQLAlchemy to sort them by input)
+    rows = BOOK_CREATE_LIST_ADAPTER.dump_python(books)  # One call for all rows
+    async with write_transaction() as db:  # One commit for the whole batch
+        result = await db.execute(
+            insert(BookDB).returning(BookDB, sort_by_parameter_order=True), rows
+        )
+        db_books = result.scalars().all()
+        await mark_books_changed(db, *(book.id for book in db_books))
+
+    return db_books
 
 
 # --- APPLICATION RUN ---